@@ -1,14 +1,46 @@
+from __future__ import annotations
+
 from dotenv import load_dotenv
+import argparse
+import gc
+import hashlib
 import json
 import os
 import subprocess
 import shutil
 import platform
+import tempfile
+import threading
+import time
 import logging
+import multiprocessing
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from music21 import converter, stream, tempo, chord, note
+from typing import TYPE_CHECKING
 from natsort import natsorted
-from pdf2image import convert_from_path
+from PIL import Image
+from pdf2image import pdfinfo_from_path
+
+# music21 takes about a second to import, so the functions that need it import it
+# themselves: spawned PDF rasterizers re-import this module but never touch a score
+if TYPE_CHECKING:
+    from music21 import stream
+
+# Optional: faster native JSON encoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional: in-process PDF rendering with PDFium instead of poppler's pdftoppm
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
 
 load_dotenv()
 
@@ -31,9 +63,228 @@ strategy = os.getenv("STRATEGY", None)
 left_hand = os.getenv("LEFT_HAND", "False").lower() == "true"
 right_hand = os.getenv("RIGHT_HAND", "False").lower() == "true"
 
+# Audiveris already snaps notes to the grid, so quantization is opt-in
+quantize = os.getenv("QUANTIZE", "False").lower() == "true"
+
+# Fixed PDF rasterization DPI; when unset it is derived from the page size
+pdf_dpi = int(os.getenv("PDF_DPI") or 0)
+PDF_TARGET_DPI = 300
+# Long edge of a US Letter page at 300 DPI
+PDF_TARGET_LONG_EDGE_PX = 3300
+PDF_MIN_DPI = 200
+PDF_MAX_DPI = 400
+
+# Each Audiveris JVM is multithreaded and memory hungry, so only run half as many as there are cores
+audiveris_workers = max(1, int(os.getenv("AUDIVERIS_WORKERS") or (os.cpu_count() or 2) // 2))
+# Every Audiveris run takes a slot, so nested retry pools cannot exceed the JVM cap
+audiveris_slots = threading.BoundedSemaphore(audiveris_workers)
+
+# Number of rendered PDF pages handed to each pipelined Audiveris batch
+audiveris_batch_size = max(1, int(os.getenv("AUDIVERIS_BATCH_SIZE") or 4))
+
+# Files processed at once when the input is a directory; each Audiveris JVM is
+# itself multithreaded, so default to half the cores
+batch_workers = max(1, int(os.getenv("BATCH_WORKERS") or (os.cpu_count() or 2) // 2))
+
+# CPUs one input may use; set per worker in batch mode, None means no limit
+cpu_budget = None
+
+# Input types picked up from a directory
+INPUT_SUFFIXES = (".pdf", ".png", ".jpg", ".jpeg")
+
+# FFmpeg encoder arguments per output format
+AUDIO_CODECS = {
+    "opus": ["-c:a", "libopus", "-b:a", "128k"],
+    "mp3": ["-c:a", "libmp3lame"],
+    "wav": ["-c:a", "pcm_s16le"],
+}
+
+# Output audio format: opus, mp3 or wav. Defaults to opus, except on macOS,
+# whose afplay cannot open Ogg Opus
+audio_format = (os.getenv("AUDIO_FORMAT") or ("mp3" if platform.system() == "Darwin" else "opus")).lower()
+
+# Niceness of the FluidSynth/FFmpeg encode stage in batch workers
+ENCODE_NICENESS = 10
+# Niceness used for this process' encode stage; only batch workers raise it
+encode_niceness = 0
+
+# Bump when a change to the pipeline should invalidate previously cached outputs
+PIPELINE_VERSION = 1
+
+# Free space /dev/shm needs before intermediates go there; Docker defaults it to 64 MB,
+# far less than a multi-page 400 DPI scan plus Audiveris books
+SCRATCH_MIN_FREE_BYTES = 1 << 30
+
+# Lines of a failed tool's output kept for the error log
+TOOL_ERROR_TAIL_LINES = 20
+
+# Ticks per quarter note used to compare note offsets exactly
+MIDI_PPQ = 480
+
+# Run a garbage collection after merging this many parsed MusicXML parts
+GC_EVERY_PARTS = 8
+
+# Parse MusicXML files in worker processes only from this many files on: spawning
+# the workers and importing music21 in each costs about a second, while a typical
+# Audiveris page parses in ~50 ms and thawing it in the parent still costs ~20 ms
+PARALLEL_PARSE_MIN_FILES = 32
+
 # === Logging setup ===
-logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+log_level = (os.getenv("LOG_LEVEL") or "INFO").upper()
+# getLevelName maps known names to their number and returns a string otherwise
+valid_log_level = isinstance(logging.getLevelName(log_level), int)
+logging.basicConfig(level=log_level if valid_log_level else logging.INFO, format="%(levelname)s: %(message)s")
 log = logging.getLogger()
+if not valid_log_level:
+    log.warning(f"Unknown LOG_LEVEL {log_level!r}, using INFO")
+
+# Reject a bad AUDIO_FORMAT before any OMR work is done
+if audio_format not in AUDIO_CODECS:
+    log.error(f"Unsupported AUDIO_FORMAT: {audio_format} (expected one of: {', '.join(AUDIO_CODECS)})")
+    exit(1)
+
+
+# === External tools ===
+def _kill_on_cancel(proc: subprocess.Popen, cancel: threading.Event):
+    while proc.poll() is None:
+        if cancel.wait(0.5):
+            proc.kill()
+            return
+
+
+def lower_priority(proc: subprocess.Popen, niceness: int):
+    """Lower a child's CPU priority so it yields to the OMR and parsing stages (POSIX only)."""
+    if niceness and hasattr(os, "setpriority"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, proc.pid, niceness)
+        except OSError:
+            pass
+
+
+def run_tool(cmd: list[str], log_path: Path | None = None, stdin=None,
+             cancel: threading.Event | None = None, niceness: int = 0) -> bool:
+    """
+        Run an external tool, streaming its combined stdout/stderr line by line.
+
+        Parameters:
+            cmd (list[str]): Command line to execute.
+            log_path (Path | None): Optional file that also receives the output.
+            stdin: Optional stdin for the child (e.g. another process' stdout).
+            cancel (threading.Event | None): When set, the process is killed.
+            niceness (int): Priority decrease applied to the process once started.
+
+        Returns:
+            bool: True if the tool finished, False if it was cancelled.
+
+        Raises:
+            subprocess.CalledProcessError: If the tool exits with an error.
+
+        With debug logging enabled, each output line is sent to `log.debug` (and
+        `log_path`) as it arrives, so nothing is buffered in memory and a verbose
+        tool can never fill the pipe and stall. Otherwise stdout is discarded and
+        only stderr is read. Either way the last `TOOL_ERROR_TAIL_LINES` lines are
+        kept, logged if the tool fails, and attached to the raised error.
+        """
+
+    debug = log.isEnabledFor(logging.DEBUG)
+    tail = deque(maxlen=TOOL_ERROR_TAIL_LINES)
+    with open(log_path, "w") if debug and log_path else nullcontext() as logfile, subprocess.Popen(
+        cmd, stdin=stdin, stdout=subprocess.PIPE if debug else subprocess.DEVNULL,
+        stderr=subprocess.STDOUT if debug else subprocess.PIPE, bufsize=1, text=True, errors="replace"
+    ) as proc:
+        lower_priority(proc, niceness)
+        if cancel is not None:
+            threading.Thread(target=_kill_on_cancel, args=(proc, cancel), daemon=True).start()
+        for line in proc.stdout if debug else proc.stderr:
+            tail.append(line)
+            if debug:
+                log.debug(line.rstrip())
+                if logfile:
+                    logfile.write(line)
+        proc.wait()
+    if cancel is not None and cancel.is_set():
+        return False
+    if proc.returncode != 0:
+        output = "".join(tail).rstrip()
+        # In debug mode the full output has already been logged
+        if output and not debug:
+            log.error(f"{Path(cmd[0]).name} exited with status {proc.returncode}:\n{output}")
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=output)
+    return True
+
+
+# === Worker pools ===
+def available_cores() -> int:
+    """
+        Number of CPUs this process may run on.
+
+        Uses the affinity mask where the platform has one, so a pinned batch worker
+        sizes its nested pools and FluidSynth threads to its own slice of cores.
+        Checked at call time, because spawned workers import this module before
+        `pin_worker` runs. Never exceeds `cpu_budget` when it is set.
+        """
+    if hasattr(os, "sched_getaffinity"):
+        cores = len(os.sched_getaffinity(0))
+    else:
+        cores = os.cpu_count() or 1
+    return max(1, min(cores, cpu_budget or cores))
+
+
+def pdf_thread_count() -> int:
+    """Rasterizer workers: leave one core free for the rest of the system while pages render."""
+    return max(1, available_cores() - 1)
+
+
+def pin_worker(counter, cores: list[int], workers: int):
+    """
+        Pool initializer that pins each worker process to its own slice of cores.
+
+        Parameters:
+            counter: Shared `multiprocessing.Value` handing out worker indices.
+            cores (list[int]): CPUs available to the pool.
+            workers (int): Number of workers sharing `cores`.
+
+        The cores are split into `workers` contiguous slices whose sizes differ by
+        at most one, so no core is left idle when the count does not divide evenly.
+        With more workers than cores, each worker gets a single core, round-robin.
+
+        Child processes (Audiveris JVMs, pdftoppm, nested pools) inherit the
+        affinity, so concurrent workers stop trading cache lines. Skipped on
+        platforms without `os.sched_setaffinity` (macOS, Windows).
+        """
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    with counter.get_lock():
+        index = counter.value % workers
+        counter.value += 1
+    if workers >= len(cores):
+        os.sched_setaffinity(0, [cores[index % len(cores)]])
+    else:
+        os.sched_setaffinity(0, cores[index * len(cores) // workers:(index + 1) * len(cores) // workers])
+
+
+def worker_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+        Create a spawn-based process pool whose workers use disjoint core sets.
+
+        Parameters:
+            max_workers (int): Number of worker processes.
+
+        Returns:
+            ProcessPoolExecutor: The pool. Workers are spawned rather than forked
+            so they never inherit threads or subprocess handles from the parent.
+        """
+    context = multiprocessing.get_context("spawn")
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=context,
+        initializer=pin_worker,
+        initargs=(context.Value("i", 0), cores, max_workers),
+    )
 
 
 # === Dependency check ===
@@ -44,7 +295,8 @@ def check_dependencies():
         Verifies:
         - Audiveris executable exists at the given path.
         - SoundFont file exists.
-        - Required CLI tools are installed: `fluidsynth`, `ffmpeg`.
+        - Required CLI tools are installed: `fluidsynth`, `ffmpeg`, and
+          `pdftoppm` (poppler) unless `pypdfium2` is available for PDF rendering.
 
         Exits the script with an error log if any are missing.
         """
@@ -56,7 +308,10 @@ def check_dependencies():
         if not path.exists():
             log.error(f"{name} not found: {path}")
             exit(1)
-    for binary in ["fluidsynth", "ffmpeg"]:
+    binaries = ["fluidsynth", "ffmpeg"]
+    if pdfium is None:
+        binaries.append("pdftoppm")
+    for binary in binaries:
         if shutil.which(binary) is None:
             log.error(f"{binary} not found. Please install it.")
             exit(1)
@@ -66,6 +321,8 @@ def apply_alternating_tempos(score, bpm1: int = 90, bpm2: int =160, seconds_per_
     Apply alternating tempos every `seconds_per_step` real seconds,
     with precise real-time alignment.
     """
+    from music21 import tempo
+
     current_offset = 0.0
     total_quarters = score.highestTime
     toggle = True
@@ -94,13 +351,15 @@ def make_score_monophonic(score: stream.Score, strategy: str) -> stream.Score:
         - 'first'  → keep first note in chord
         - 'last'   → keep last note in chord
     """
+    from music21 import chord, note, stream
 
     mono_score = stream.Score()
     flat = score.flatten().notes.stream()
     note_dict = {}
 
     for n in flat:
-        offset = round(n.offset, 3)
+        # Key by integer MIDI ticks: exact equality and cheap hashing
+        tick = round(n.offset * MIDI_PPQ)
 
         # Convert chord to note using strategy
         if isinstance(n, chord.Chord):
@@ -120,16 +379,19 @@ def make_score_monophonic(score: stream.Score, strategy: str) -> stream.Score:
             selected = n
 
         # Replace if no note yet at this offset or selected one is "preferred"
-        if offset not in note_dict:
-            note_dict[offset] = selected
+        if tick not in note_dict:
+            note_dict[tick] = selected
         else:
             # Optional: decide replacement logic
-            note_dict[offset] = selected  # overwrite with new strategy
+            note_dict[tick] = selected  # overwrite with new strategy
 
+    # Notes are added in offset order, so use the core API and let music21
+    # finalize the part once instead of re-checking it on every insert
     mono_part = stream.Part()
-    for offset in sorted(note_dict):
-        mono_note = note_dict[offset]
-        mono_part.insert(mono_note.offset, mono_note)
+    for tick in sorted(note_dict):
+        mono_note = note_dict[tick]
+        mono_part.coreInsert(mono_note.offset, mono_note)
+    mono_part.coreElementsChanged()
 
     mono_score.insert(0, mono_part)
     return mono_score
@@ -145,47 +407,59 @@ def filter_score_by_pitch(score: stream.Score, min_pitch: int = None, max_pitch:
     Returns:
         stream.Score: A new score containing only the filtered notes.
     """
+    from music21 import chord, stream
 
     filtered_score = stream.Score()
     part = stream.Part()
 
+    # One bit per allowed MIDI number, so each pitch test is a shift and a mask
+    lo = 0 if min_pitch is None else min_pitch
+    hi = 127 if max_pitch is None else max_pitch
+    allowed = ((1 << (hi - lo + 1)) - 1) << lo if hi >= lo else 0
+
+    # The flattened notes are already in offset order, so use the core API and
+    # let music21 finalize the part once instead of re-checking it on every insert
     for n in score.flatten().notes:
         if n.isNote:
-            pitch_val = n.pitch.midi
-            if ((min_pitch is None or pitch_val >= min_pitch) and
-                    (max_pitch is None or pitch_val <= max_pitch)):
-                part.insert(n.offset, n)
+            if (allowed >> n.pitch.midi) & 1:
+                part.coreInsert(n.offset, n)
         elif n.isChord:
             # Filter pitches in the chord
-            pitches = [p for p in n.pitches if
-                       (min_pitch is None or p.midi >= min_pitch) and
-                       (max_pitch is None or p.midi <= max_pitch)]
+            pitches = [p for p in n.pitches if (allowed >> p.midi) & 1]
             if pitches:
                 new_chord = chord.Chord(pitches)
                 new_chord.duration = n.duration
                 new_chord.offset = n.offset
-                part.insert(new_chord.offset, new_chord)
+                part.coreInsert(new_chord.offset, new_chord)
+    part.coreElementsChanged()
 
     filtered_score.insert(0, part)
     return filtered_score
 
-def extract_midi_note_sequence(midi_path: Path) -> list[dict]:
+def extract_note_sequence(score: stream.Stream) -> list[dict]:
     """
-    Extract note sequences from a MIDI file for comparison/debugging.
+    Extract note sequences from an in-memory score for comparison/debugging.
 
-    Returns a list of dicts with offset and pitch info.
+    Returns a list of dicts with offset and pitch info, matching what the
+    written MIDI file plays: tied notes are merged into one entry and offsets
+    are absolute, in quarter notes from the start of the score. Chords are
+    reported by their first pitch. Chord symbols and unpitched notes are
+    skipped, as they never reach the MIDI file.
     """
-    midi_score = converter.parse(midi_path)
+    from music21 import harmony
+
     sequence = []
-    for n in midi_score.recurse().notes:
+    for n in score.stripTies().flatten().notes:
+        if isinstance(n, harmony.ChordSymbol):
+            continue
         if n.isNote:
             sequence.append({
-                "offset": round(n.offset, 2),
+                "offset": round(float(n.offset), 2),
                 "pitch": n.nameWithOctave
             })
-        elif n.isChord:
+        elif n.isChord and n.pitches:
             sequence.append({
-                "offset": round(n.offset, 2),
+                "offset": round(float(n.offset), 2),
                 "pitch": n.pitches[0].nameWithOctave
             })
     return sequence
@@ -201,70 +475,257 @@ def save_note_sequence_as_json(notes: list[dict], json_path: Path):
             json_path (Path): Destination file path where the JSON will be saved.
 
         The resulting JSON file will be human-readable (pretty-printed with indentation).
+        Uses `orjson` when it is installed, falling back to the standard library.
         """
+    if orjson is not None:
+        json_path.write_bytes(orjson.dumps(notes, option=orjson.OPT_INDENT_2))
+        return
     with open(json_path, "w") as f:
         json.dump(notes, f, indent=2)
 
 # === Audio playback ===
-def play_audio(mp3_path: Path):
+# Resolve the platform's player once at import time
+_AUDIO_PLAYERS = {
+    "Darwin": lambda path: subprocess.run(["afplay", str(path)], check=True),
+    "Linux": lambda path: subprocess.run(["xdg-open", str(path)], check=True),
+    "Windows": lambda path: os.startfile(str(path)),
+}
+audio_player = _AUDIO_PLAYERS.get(platform.system())
+
+
+def play_audio(audio_path: Path):
     """
-        Attempt to play the generated MP3 file using the system's default audio player.
+        Attempt to play the generated audio file using the system's default audio player.
 
         Parameters:
-            mp3_path (Path): Path to the MP3 file.
+            audio_path (Path): Path to the audio file.
 
         Platform-specific behavior:
-        - macOS: Uses `afplay`
+        - macOS: Uses `afplay`, which cannot open Opus (hence the MP3 default there)
         - Linux: Uses `xdg-open`
         - Windows: Uses `os.startfile`
         """
 
+    if audio_player is None:
+        return
     try:
-        if platform.system() == "Darwin":
-            subprocess.run(["afplay", str(mp3_path)])
-        elif platform.system() == "Linux":
-            subprocess.run(["xdg-open", str(mp3_path)])
-        elif platform.system() == "Windows":
-            os.startfile(str(mp3_path))
+        audio_player(audio_path)
     except Exception as e:
         log.warning(f"Could not play audio: {e}")
 
 # === Convert input to images ===
-def convert_to_images(input_path: Path, temp_dir: Path) -> list[Path]:
+def render_pdfium_page(input_path: str, number: int, img_path: str, dpi: int) -> Path:
+    """
+        Render one PDF page to a grayscale PNG with PDFium.
+
+        Parameters:
+            input_path (str): Path to input PDF.
+            number (int): 1-based page number.
+            img_path (str): Output PNG path.
+            dpi (int): Render resolution.
+
+        Returns:
+            Path: The written image path.
+
+        PDFium is not thread-safe, so this runs in a worker process that opens
+        its own copy of the document.
+        """
+
+    pdf = pdfium.PdfDocument(input_path)
+    try:
+        image = pdf[number - 1].render(scale=dpi / 72, grayscale=True).to_pil()
+    finally:
+        pdf.close()
+    # Scratch images are re-decoded by Audiveris, so favour fast deflate
+    image.save(img_path, optimize=False, compress_level=1)
+    return Path(img_path)
+
+
+def pdf_render_dpi(width_pt: float | None, height_pt: float | None) -> int:
     """
-        Convert a PDF file or copy a single image into a temporary image directory.
+        Pick the rasterization DPI for a PDF page of the given size.
 
         Parameters:
-            input_path (Path): Path to input PDF or image.
+            width_pt (float | None): Page width in PostScript points (1/72 in).
+            height_pt (float | None): Page height in points.
+
+        Returns:
+            int: `PDF_DPI` when set; otherwise the DPI that renders the page's long
+            edge at `PDF_TARGET_LONG_EDGE_PX`, clamped to the range Audiveris reads
+            reliably. Unknown sizes use `PDF_TARGET_DPI`.
+
+        Audiveris needs roughly 300 DPI for staff detection on a standard page;
+        anything more only adds pixels (cost grows with the square of the DPI).
+        """
+
+    if pdf_dpi:
+        return pdf_dpi
+    if not width_pt or not height_pt:
+        return PDF_TARGET_DPI
+    dpi = round(PDF_TARGET_LONG_EDGE_PX * 72 / max(width_pt, height_pt))
+    return min(max(dpi, PDF_MIN_DPI), PDF_MAX_DPI)
+
+
+def iter_pdf_pages(input_path: Path, temp_dir: Path):
+    """
+        Rasterize a PDF page by page, yielding each image as soon as it is written.
+
+        Parameters:
+            input_path (Path): Path to input PDF.
             temp_dir (Path): Directory to store output images.
 
+        Yields:
+            Path: Image paths in page order.
+
+        Pages are rendered by up to `pdf_thread_count()` workers at once, straight
+        into `temp_dir` at the DPI chosen by `pdf_render_dpi` for the first page,
+        so later pages keep rendering while the caller works on earlier ones.
+        With `pypdfium2` installed, pages are rendered in-process by PDFium
+        worker processes; otherwise each page is a pdftoppm call.
+        """
+
+    temp_dir.mkdir(parents=True, exist_ok=True)
+
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(str(input_path))
+        page_count = len(pdf)
+        dpi = pdf_render_dpi(*pdf[0].get_size()) if page_count else PDF_TARGET_DPI
+        pdf.close()
+        with worker_pool(pdf_thread_count()) as executor:
+            futures = [
+                executor.submit(render_pdfium_page, str(input_path), number,
+                                str(temp_dir / f"page_{number:03}.png"), dpi)
+                for number in range(1, page_count + 1)
+            ]
+            for future in futures:
+                yield future.result()
+        return
+
+    info = pdfinfo_from_path(str(input_path))
+    page_count = info["Pages"]
+    try:
+        # e.g. "612 x 792 pts (letter)"
+        width, _, height = info["Page size"].split()[:3]
+        dpi = pdf_render_dpi(float(width), float(height))
+    except (KeyError, ValueError):
+        dpi = pdf_render_dpi(None, None)
+
+    def render_page(number: int) -> Path:
+        # Call pdftoppm directly: convert_from_path would re-run pdfinfo and a
+        # version probe for every page, then list the whole output folder.
+        # pdftoppm writes the PNG itself; nothing is decoded into PIL. It uses
+        # libpng's default zlib level rather than the PDFium path's compress_level=1,
+        # and there is no option to change it; re-saving through PIL or writing
+        # uncompressed TIFF (~8 MB per page in scratch) would cost more than it saves
+        out_root = temp_dir / f"page_{number:03}"
+        run_tool([
+            "pdftoppm", "-gray", "-png", "-r", str(dpi),
+            "-f", str(number), "-l", str(number), "-singlefile",
+            str(input_path), str(out_root)
+        ])
+        return out_root.with_suffix(".png")
+
+    with ThreadPoolExecutor(max_workers=pdf_thread_count()) as executor:
+        futures = [executor.submit(render_page, number) for number in range(1, page_count + 1)]
+        for future in futures:
+            yield future.result()
+
+
+def convert_to_images(input_path: Path, temp_dir: Path) -> list[Path]:
+    """
+        Place a single image input into a temporary image directory.
+
+        Parameters:
+            input_path (Path): Path to input image (JPG, PNG).
+            temp_dir (Path): Directory to store the image.
+
         Returns:
-            list[Path]: List of generated or copied image paths.
+            list[Path]: The image path, `page_001.png`.
 
-        Notes:
-        - PDFs are split into 400 DPI grayscale PNGs.
-        - Single image files (JPG, PNG) are copied and renamed as page_001.png.
+        The image is hard-linked (or copied) rather than re-encoded. PDFs never
+        come through here; `run_audiveris_pipelined` rasterizes them page by page.
         """
 
     temp_dir.mkdir(parents=True, exist_ok=True)
-    image_paths = []
-    if input_path.suffix.lower() == ".pdf":
-        log.info("Converting PDF to high-res grayscale images...")
-        pages = convert_from_path(str(input_path), dpi=400)
-        for i, page in enumerate(pages):
-            page = page.convert("L")
-            img_path = temp_dir / f"page_{i+1:03}.png"
-            page.save(img_path)
-            image_paths.append(img_path)
-    else:
-        log.info(f"Copying input image: {input_path.name}")
-        img_path = temp_dir / "page_001.png"
-        shutil.copy(input_path, img_path)
-        image_paths.append(img_path)
-    return image_paths
+    log.info(f"Copying input image: {input_path.name}")
+    img_path = temp_dir / "page_001.png"
+    img_path.unlink(missing_ok=True)
+    try:
+        # Hard link when on the same filesystem — no bytes are copied
+        os.link(input_path, img_path)
+    except OSError:
+        shutil.copyfile(input_path, img_path)
+    return [img_path]
 
 # === Run Audiveris ===
-def run_audiveris(images: list[Path], out_dir: Path):
+def pack_book(images: list[Path]) -> Path:
+    """
+    Combine page images into a single multi-page TIFF for Audiveris.
+
+    Parameters:
+        images (list[Path]): Page images in order.
+
+    Returns:
+        Path: The TIFF, written next to the first image and named after the page range.
+
+    One multi-page input is opened as a single book with one sheet per page,
+    instead of one book (and file open) per image. LZW keeps the grayscale
+    pages lossless; Group 4 would force them to bilevel.
+    """
+
+    book_path = images[0].with_name(f"{images[0].stem}-{images[-1].stem}.tif")
+    with ExitStack() as stack:
+        pages = [stack.enter_context(Image.open(img)) for img in images]
+        pages[0].save(book_path, save_all=True, append_images=pages[1:], compression="tiff_lzw")
+    return book_path
+
+
+def run_audiveris_on(images: list[Path], out_dir: Path, log_path: Path):
+    """
+    Run a single Audiveris batch invocation on the given images.
+
+    Parameters:
+        images (list[Path]): Image paths handed to one JVM.
+        out_dir (Path): Output directory for MusicXML files.
+        log_path (Path): File receiving Audiveris stdout and stderr.
+
+    Several images are packed into one multi-page TIFF book first (see
+    `pack_book`); the TIFF is removed afterwards, the page images are kept.
+
+    Each book exports into its own subdirectory of `out_dir`, which is deleted
+    if Audiveris fails. A partly exported book therefore never lingers next to
+    the retries of its halves, whose names cover different page ranges.
+
+    Audiveris is very verbose, so its output is only streamed to the debug log
+    and `log_path` when debug logging is enabled (LOG_LEVEL=DEBUG).
+
+    Blocks until one of the `audiveris_slots` is free, so no caller can run
+    more than `audiveris_workers` JVMs at once.
+
+    Raises:
+        subprocess.CalledProcessError: If Audiveris exits with an error, or exits
+            cleanly without exporting any MusicXML for the book.
+    """
+
+    book = pack_book(images) if len(images) > 1 else images[0]
+    book_dir = out_dir / book.stem
+    cmd = [str(audiveris_bin), "-batch", "-export", "-output", str(book_dir), str(book)]
+    try:
+        with audiveris_slots:
+            run_tool(cmd, log_path=log_path)
+        # Audiveris exits 0 when it cannot recognize a book, so check the export itself
+        if not book_dir.is_dir() or not any(find_scores(book_dir)):
+            log.warning(f"Audiveris exported no MusicXML for {book.name}")
+            raise subprocess.CalledProcessError(0, cmd, stderr="no MusicXML exported")
+    except subprocess.CalledProcessError:
+        shutil.rmtree(book_dir, ignore_errors=True)
+        raise
+    finally:
+        if book is not images[0]:
+            book.unlink(missing_ok=True)
+
+
+def run_audiveris(images: list[Path], out_dir: Path) -> list[Path]:
     """
     Run Audiveris OMR in batch mode on a list of image files to extract MusicXML.
 
@@ -272,59 +733,131 @@ def run_audiveris(images: list[Path], out_dir: Path):
         images (list[Path]): List of image paths to process.
         out_dir (Path): Output directory for MusicXML files.
 
-    This function logs output to a single batch log file. If Audiveris fails,
-    it logs a warning and returns without falling back automatically.
+    Returns:
+        list[Path]: The images that failed on their own and were skipped.
+
+    In debug mode this function logs output to one batch log file per call. If the batch run fails,
+    the image list is bisected and each half is retried in its own JVM until the
+    failing pages are isolated. The retries share `audiveris_slots` with every
+    other Audiveris run, so failing batches never add JVMs beyond the cap. A page
+    that still fails on its own is logged and skipped.
     """
 
-    log_path = out_dir / "audiveris_batch.log"
+    # Named after the first image so concurrent batches do not share a log file
+    log_path = out_dir / f"{images[0].stem}_audiveris_batch.log"
     log.info(f"Running Audiveris batch on {len(images)} image(s)...")
 
     try:
-        with open(log_path, "w") as logfile:
-            subprocess.run(
-                [
-                    str(audiveris_bin),
-                    "-batch",
-                    "-export",
-                    "-output", str(out_dir),
-                    *map(str, images)  # Unpacks each image path
-                ],
-                check=True,
-                stdout=logfile,
-                stderr=subprocess.STDOUT
-            )
+        run_audiveris_on(images, out_dir, log_path)
+        return []
     except subprocess.CalledProcessError:
-        log.warning("No MusicXML from batch — falling back to per-image Audiveris mode...")
+        if len(images) == 1:
+            log.warning(f"Audiveris failed for {images[0].name}")
+            return images
+        log.warning("No MusicXML from batch — bisecting images to isolate failing pages...")
+
+    # === Fallback: Bisect failing groups ===
+    def run_group(group: list[Path]) -> bool:
+        name = group[0].stem if len(group) == 1 else f"{group[0].stem}-{group[-1].stem}"
+        log.info(f"Running Audiveris on: {name}")
+        try:
+            run_audiveris_on(group, out_dir, out_dir / f"{name}_audiveris.log")
+            return True
+        except subprocess.CalledProcessError:
+            if len(group) == 1:
+                log.warning(f"Audiveris failed for {group[0].name}")
+            return False
+
+    failed, skipped = [images], []
+    with ThreadPoolExecutor(max_workers=audiveris_workers) as executor:
+        while failed:
+            groups = []
+            for group in failed:
+                if len(group) > 1:
+                    mid = len(group) // 2
+                    groups += [group[:mid], group[mid:]]
+            results = executor.map(run_group, groups)
+            failed = [group for group, ok in zip(groups, results) if not ok]
+            skipped += [group[0] for group in failed if len(group) == 1]
+    return sorted(skipped)
+
+def run_audiveris_pipelined(input_path: Path, image_dir: Path, out_dir: Path,
+                            timings: dict[str, float] | None = None) -> tuple[list[Path], list[Path]]:
+    """
+    Rasterize a PDF and run Audiveris on batches of pages as soon as they are written.
 
-        # === Fallback: Per-image mode ===
-        for img in images:
-            log.info(f"Running Audiveris on: {img.name}")
-            per_image_log = out_dir / f"{img.stem}_audiveris.log"
-            try:
-                with open(per_image_log, "w") as logfile:
-                    subprocess.run(
-                        [
-                            str(audiveris_bin),
-                            "-batch",
-                            "-export",
-                            "-output", str(out_dir),
-                            str(img)
-                        ],
-                        check=True,
-                        stdout=logfile,
-                        stderr=subprocess.STDOUT
-                    )
-            except subprocess.CalledProcessError:
-                log.warning(f"Audiveris failed for {img.name}")
+    Parameters:
+        input_path (Path): Path to input PDF.
+        image_dir (Path): Directory to store page images.
+        out_dir (Path): Output directory for MusicXML files.
+        timings (dict[str, float] | None): Receives the rasterization time as "images".
+
+    Returns:
+        tuple[list[Path], list[Path]]: The rasterized page images and the pages
+        Audiveris failed on and skipped.
+
+    Every `audiveris_batch_size` rendered pages are handed to one Audiveris batch
+    run, so later pages keep rendering while earlier batches are recognized and
+    each JVM startup is shared by several pages. Up to `audiveris_workers`
+    batches run at once, bounded by `audiveris_slots`.
+    """
+
+    log.info("Converting PDF to high-res grayscale images and running Audiveris in batches...")
+    images, batch, futures = [], [], []
+    timings = {} if timings is None else timings
+    with ThreadPoolExecutor(max_workers=audiveris_workers) as executor:
+        # Submitting never blocks, so this measures rasterization alone
+        with pipeline_stage("images", timings):
+            for img in iter_pdf_pages(input_path, image_dir):
+                images.append(img)
+                batch.append(img)
+                if len(batch) == audiveris_batch_size:
+                    futures.append(executor.submit(run_audiveris, batch, out_dir))
+                    batch = []
+        if batch:
+            futures.append(executor.submit(run_audiveris, batch, out_dir))
+        skipped = [img for future in futures for img in future.result()]
+    return images, skipped
+
+def find_scores(root: Path) -> tuple[list[Path], list[Path]]:
+    """
+    Collect MusicXML files below a directory in a single walk.
+
+    Parameters:
+        root (Path): Directory to search recursively.
+
+    Returns:
+        tuple[list[Path], list[Path]]: The `.mxl` files and the `.xml` files found.
+
+    Uses an explicit `os.scandir` stack and only builds `Path` objects for matches,
+    which keeps the walk cheap on Audiveris' many intermediate files.
+    """
+
+    mxl_files, xml_files = [], []
+    stack = [str(root)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                name = entry.name.lower()
+                if name.endswith(".mxl"):
+                    mxl_files.append(Path(entry.path))
+                elif name.endswith(".xml"):
+                    xml_files.append(Path(entry.path))
+    return mxl_files, xml_files
 
 # === MuseScore fallback ===
-def try_musescore_fallback(input_file: Path, out_dir: Path) -> list[Path]:
+def try_musescore_fallback(input_file: Path, out_dir: Path, cancel: threading.Event | None = None) -> list[Path]:
     """
         Fallback method to convert a PDF to MusicXML using MuseScore's CLI export.
 
         Parameters:
             input_file (Path): Path to PDF file.
             out_dir (Path): Directory to store the converted MusicXML.
+            cancel (threading.Event | None): When set, the running MuseScore
+                process is killed and an empty list is returned.
 
         Returns:
             list[Path]: List containing the generated .mxl file, or empty list on failure.
@@ -335,179 +868,727 @@ def try_musescore_fallback(input_file: Path, out_dir: Path) -> list[Path]:
     musescore = shutil.which("musescore3") or shutil.which("mscore") or shutil.which("musescore")
     if not musescore or input_file.suffix.lower() != ".pdf":
         return []
+    out_dir.mkdir(parents=True, exist_ok=True)
     output_xml = out_dir / (input_file.stem + ".mxl")
     log.info("Running MuseScore fallback...")
     try:
-        subprocess.run([musescore, str(input_file), "-o", str(output_xml)], check=True)
-        if output_xml.exists():
-            return [output_xml]
+        if not run_tool([musescore, str(input_file), "-o", str(output_xml)], cancel=cancel):
+            log.info("MuseScore fallback cancelled.")
+            return []
     except subprocess.CalledProcessError:
         log.error("MuseScore fallback failed.")
+        return []
+    if output_xml.exists():
+        return [output_xml]
     return []
 
 # === MusicXML → MIDI ===
-def convert_to_midi(mp3_base: str, mxl_files: list[Path], out_dir: Path) -> Path | None:
+def parse_musicxml(path: Path | str) -> stream.Score:
+    """
+        Parse a MusicXML (.mxl/.xml) file with music21.
+
+        Parameters:
+            path (Path | str): Path to the MusicXML file.
+
+        Returns:
+            stream.Score: The parsed score.
+
+        The format is given explicitly to skip music21's format detection, and
+        `forceSource` skips the pickle cache, which never hits for fresh
+        Audiveris output.
+        """
+    from music21 import converter
+
+    return converter.parse(str(path), format="musicxml", forceSource=True)
+
+
+def _stream_has_measures(f) -> bool:
+    for _, elem in ET.iterparse(f, events=("end",)):
+        # Compare the local name so namespaced documents match too
+        if elem.tag.rpartition("}")[2] == "measure":
+            return True
+        # Drop finished elements so memory stays flat on long scores
+        elem.clear()
+    return False
+
+
+def has_measures(path: Path) -> bool:
+    """
+        Check whether a MusicXML file contains at least one measure.
+
+        Parameters:
+            path (Path): Path to a .mxl or .xml file.
+
+        Returns:
+            bool: True as soon as a <measure> is seen. Files that cannot be
+            scanned are reported as True and left for music21 to handle.
+
+        The file is streamed with `iterparse` rather than built into a tree, so
+        an empty export is rejected without a full music21 parse. Pages with
+        only rests still count, since they keep their place in the timeline.
+        """
+
+    try:
+        if path.suffix.lower() == ".mxl":
+            with zipfile.ZipFile(path) as archive:
+                container = ET.fromstring(archive.read("META-INF/container.xml"))
+                rootfile = next(el.get("full-path") for el in container.iter() if el.tag.endswith("rootfile"))
+                with archive.open(rootfile) as f:
+                    return _stream_has_measures(f)
+        with open(path, "rb") as f:
+            return _stream_has_measures(f)
+    except (OSError, KeyError, StopIteration, zipfile.BadZipFile, ET.ParseError):
+        return True
+
+
+def prepare_score(score: stream.Score) -> stream.Score:
+    """
+        Apply the per-file clean-up that does not depend on other files.
+
+        Parameters:
+            score (stream.Score): A freshly parsed score.
+
+        Returns:
+            stream.Score: The score transposed by `transpose_interval` (if set)
+            with repeat marks and tempo marks removed.
+        """
+    from music21 import bar, spanner, tempo
+
+    if transpose_interval != 0:
+        score = score.transpose(transpose_interval)
+
+    # Remove broken repeat marks and tempo marks in a single pass,
+    # collecting first so the score is not mutated while it is walked
+    to_remove = [
+        el for el in score.recurse()
+        if isinstance(el, (bar.Repeat, spanner.RepeatBracket, tempo.MetronomeMark))
+    ]
+    for el in to_remove:
+        if el.activeSite is not None:
+            el.activeSite.remove(el)
+    return score
+
+
+def parse_score_file(path: str) -> bytes:
+    """
+        Parse and prepare a MusicXML file in a worker process.
+
+        Parameters:
+            path (str): Path to the .mxl/.xml file.
+
+        Returns:
+            bytes: The prepared score, frozen with music21 so it can be sent back
+            to the parent process.
+        """
+    from music21 import converter
+
+    return converter.freezeStr(prepare_score(parse_musicxml(path)))
+
+
+def iter_prepared_scores(files: list[Path]):
+    """
+        Parse and prepare MusicXML files, yielding the scores in the given order.
+
+        Parameters:
+            files (list[Path]): The .mxl/.xml files, already sorted.
+
+        Yields:
+            stream.Score: Each file's score after `prepare_score`.
+
+        Files are parsed in-process unless there are at least
+        `PARALLEL_PARSE_MIN_FILES` of them and more than one core is available;
+        only then does a worker pool win back its spawn cost. Each pooled part is
+        thawed as it arrives so its frozen copy can be released straight away.
+        """
+    from music21 import converter
+
+    cores = available_cores()
+    if len(files) < PARALLEL_PARSE_MIN_FILES or cores == 1:
+        for path in files:
+            yield prepare_score(parse_musicxml(path))
+        return
+
+    # music21 parsing is pure Python and holds the GIL, so use processes
+    with worker_pool(min(len(files), cores)) as executor:
+        for frozen in executor.map(parse_score_file, map(str, files)):
+            score = converter.thawStr(frozen)
+            del frozen
+            yield score
+
+
+def convert_to_midi(base_name: str, mxl_files: list[Path], out_dir: Path) -> Path:
     """
         Convert one or more MusicXML files into a single MIDI file.
 
         Parameters:
-            mp3_base (str): Base name for output MIDI file.
+            base_name (str): Base name for output MIDI file.
             mxl_files (list[Path]): List of MusicXML (.mxl/.xml) files.
             out_dir (Path): Directory to save the MIDI file.
 
         Returns:
-            Path | None: Path to the generated MIDI file, or None if failed.
+            Path: Path to the generated MIDI file.
+
+        Raises:
+            ValueError: If both LEFT_HAND and RIGHT_HAND are enabled.
+            Exception: music21 parse and write errors propagate unchanged, so
+                `pipeline_stage` can chain them to the `PipelineError`.
 
         Additional Features:
+        - Skips MusicXML files without any measures using a streaming pre-scan.
+        - Parses, transposes and cleans many MusicXML files in parallel worker processes.
         - Removes repeat marks and tempo anomalies.
         - Inserts consistent tempo (160 BPM).
-        - Applies quantization to fix note timing artifacts.
+        - Optionally applies quantization to fix note timing artifacts (QUANTIZE=true).
         """
+    from music21 import stream, tempo
 
-    midi_path = out_dir / f"{mp3_base}.mid"
+    midi_path = out_dir / f"{base_name}.mid"
     log.info("Converting MusicXML to MIDI...")
 
-    try:
-        if len(mxl_files) == 1:
-            score = converter.parse(mxl_files[0])
-        else:
-            score = stream.Score()
-            for f in natsorted(mxl_files):
-                part = converter.parse(f)
-                score.append(part)
-
-        if transpose_interval != 0:
-            log.info(f"Transposing all notes by {transpose_interval} semitone(s)...")
-            score = score.transpose(transpose_interval)
-
-        # Remove broken repeat marks
-        for el in score.recurse():
-            if el.classes and ("Repeat" in el.classes or "RepeatBracket" in el.classes):
-                el.activeSite.remove(el)
-
-        # Clean tempo and add uniform tempo
-        for t in score.recurse().getElementsByClass(tempo.MetronomeMark):
-            t.activeSite.remove(t)
-        score.insert(0, tempo.MetronomeMark(number=160))
-
-        if left_hand and right_hand:
-            raise ValueError("Cannot enable both left_hand and right_hand simultaneously.")
-
-        # Filter by pitch (left or right hand) before making monophonic
-        if left_hand:
-            log.info("Filtering for left hand")
-            score = filter_score_by_pitch(score, max_pitch=60)
-
-        elif right_hand:
-            log.info("Filtering for right hand")
-            score = filter_score_by_pitch(score, min_pitch=61)
-
-        # Now apply monophonic strategy if given
-        if strategy is not None:
-            log.info(f"MIDI conversion for strategy: {strategy}")
-            score = make_score_monophonic(score, strategy=strategy)
-
-        # === Insert here: Apply alternating tempos ===
-        # log.info("Applying alternating tempos: 90 ↔ 160 BPM every 10s")
-        # score = apply_alternating_tempos(score, bpm1=90, bpm2=160, seconds_per_step=10)
+    # Skip files Audiveris exported without any measures before paying for a full parse
+    with_measures = [f for f in mxl_files if has_measures(f)]
+    for f in set(mxl_files) - set(with_measures):
+        log.info(f"Skipping MusicXML without measures: {f.name}")
+    mxl_files = with_measures or mxl_files
 
-        score.quantize(inPlace=True)
-        score.write("midi", fp=str(midi_path))
-        note_data = extract_midi_note_sequence(midi_path)
-        json_path = midi_path.with_suffix(".json")
-        save_note_sequence_as_json(note_data, json_path)
-        log.info(f"Note sequence saved: {json_path}")
-        log.info(f"MIDI saved: {midi_path}")
-        return midi_path
-    except Exception as e:
-        log.error(f"MIDI conversion failed: {e}")
-        return None
+    if transpose_interval != 0:
+        log.info(f"Transposing all notes by {transpose_interval} semitone(s)...")
 
-# === MIDI → MP3 ===
-def convert_midi_to_mp3(midi_path: Path, mp3_path: Path):
+    if len(mxl_files) == 1:
+        score = prepare_score(parse_musicxml(mxl_files[0]))
+    else:
+        score = stream.Score()
+        for i, part in enumerate(iter_prepared_scores(natsorted(mxl_files)), start=1):
+            score.append(part)
+            # Reclaim reference cycles left behind by parsing every few parts
+            if i % GC_EVERY_PARTS == 0:
+                gc.collect()
+
+    # Add uniform tempo
+    score.insert(0, tempo.MetronomeMark(number=160))
+
+    if left_hand and right_hand:
+        raise ValueError("Cannot enable both left_hand and right_hand simultaneously.")
+
+    # Filter by pitch (left or right hand) before making monophonic
+    if left_hand:
+        log.info("Filtering for left hand")
+        score = filter_score_by_pitch(score, max_pitch=60)
+
+    elif right_hand:
+        log.info("Filtering for right hand")
+        score = filter_score_by_pitch(score, min_pitch=61)
+
+    # Now apply monophonic strategy if given
+    if strategy is not None:
+        log.info(f"MIDI conversion for strategy: {strategy}")
+        score = make_score_monophonic(score, strategy=strategy)
+
+    # === Insert here: Apply alternating tempos ===
+    # log.info("Applying alternating tempos: 90 ↔ 160 BPM every 10s")
+    # score = apply_alternating_tempos(score, bpm1=90, bpm2=160, seconds_per_step=10)
+
+    if quantize:
+        log.info("Quantizing note offsets and durations...")
+        score.quantize(inPlace=True)
+    score.write("midi", fp=str(midi_path))
+    note_data = extract_note_sequence(score)
+    json_path = midi_path.with_suffix(".json")
+    save_note_sequence_as_json(note_data, json_path)
+    log.info(f"Note sequence saved: {json_path}")
+    log.info(f"MIDI saved: {midi_path}")
+    return midi_path
+
+# === MIDI → Audio ===
+def convert_midi_to_audio(midi_path: Path, audio_path: Path) -> Path:
     """
-        Convert a MIDI file to MP3 using FluidSynth and FFmpeg.
+        Convert a MIDI file to audio using FluidSynth and FFmpeg.
 
         Parameters:
             midi_path (Path): Path to the input .mid file.
-            mp3_path (Path): Output path for the final MP3.
+            audio_path (Path): Output path; its suffix (.opus, .mp3 or .wav) picks the codec.
 
         Workflow:
-        - FluidSynth renders the MIDI to a WAV file using the configured SoundFont.
-        - FFmpeg normalizes and encodes the WAV file to MP3.
-        - The temporary WAV is deleted after use.
+        - FluidSynth fast-renders the MIDI dry (no reverb/chorus) as raw 16-bit PCM to
+          stdout using the configured SoundFont. With `-F` and no audio driver it is
+          not clocked to realtime, and `synth.cpu-cores` spreads voices across cores.
+        - FFmpeg reads the PCM from a pipe, normalizes it with `dynaudnorm` and encodes it.
+        - No intermediate WAV file is written to disk.
 
-        Plays the MP3 if successfully created.
-        """
+        Opus is the default output (MP3 on macOS): it has no MP3-style encoder
+        priming delay and encodes faster than LAME.
 
-    if not midi_path or not midi_path.exists():
-        log.error("No valid MIDI to convert.")
-        return
+        Returns:
+            Path: Path to the audio file.
+
+        Raises:
+            FileNotFoundError: If `midi_path` does not exist.
+            ValueError: If the output suffix is not a supported audio format.
+            subprocess.CalledProcessError: If FluidSynth or FFmpeg fails.
+        """
 
-    wav_path = midi_path.with_suffix(".wav")
-    log.info("Converting MIDI → MP3 with normalization...")
+    if not midi_path.exists():
+        raise FileNotFoundError(f"No valid MIDI to convert: {midi_path}")
+
+    audio_format = audio_path.suffix.lstrip(".").lower()
+    codec = AUDIO_CODECS.get(audio_format)
+    if codec is None:
+        raise ValueError(f"Unsupported audio format: {audio_format}")
+
+    log.info(f"Converting MIDI → {audio_format.upper()} with normalization...")
+    synth = subprocess.Popen([
+        "fluidsynth", "-ni", "-q", "-T", "raw", "-O", "s16", "-F", "-",
+        "-R", "0", "-C", "0",  # Dry render: skip reverb and chorus DSP
+        "-o", f"synth.cpu-cores={available_cores()}",
+        "-r", "44100", "-g", "1.0",
+        str(soundfont_path), str(midi_path)
+    ], stdout=subprocess.PIPE)
+    lower_priority(synth, encode_niceness)
     try:
-        subprocess.run([
-            "fluidsynth", "-ni", str(soundfont_path), str(midi_path),
-            "-F", str(wav_path), "-r", "44100", "-g", "1.0"
-        ], check=True)
-        subprocess.run([
-            "ffmpeg", "-y", "-i", str(wav_path),
-            "-filter:a", "loudnorm",
-            str(mp3_path)
-        ], check=True)
-        wav_path.unlink(missing_ok=True)
-        log.info(f"MP3 created: {mp3_path}")
-        play_audio(mp3_path)
-    except subprocess.CalledProcessError:
-        log.error("Error converting MIDI to MP3.")
+        run_tool([
+            "ffmpeg", "-y", "-f", "s16le", "-ar", "44100", "-ac", "2", "-i", "pipe:0",
+            # Dynamic normalizer: buffers only its 15-frame Gaussian window (g=15 x 200 ms)
+            "-filter:a", "dynaudnorm=f=200:g=15",
+            *codec,
+            str(audio_path)
+        ], stdin=synth.stdout, niceness=encode_niceness)
+    finally:
+        synth.stdout.close()
+        synth.wait()
+    if synth.returncode != 0:
+        raise subprocess.CalledProcessError(synth.returncode, synth.args)
+    log.info(f"{audio_format.upper()} created: {audio_path}")
+    return audio_path
 
 # === Pipeline ===
-def process_input(input_file: Path, output_dir: Path):
+class PipelineError(RuntimeError):
     """
-        Full pipeline for processing a single sheet music input file.
+        Raised when a pipeline stage cannot produce its output.
+
+        Attributes:
+            stage (str): Name of the failing stage (e.g. "omr", "midi", "audio").
+        """
+
+    def __init__(self, stage: str, message: str):
+        super().__init__(message)
+        self.stage = stage
+
+    def __reduce__(self):
+        # Keep `stage` when the error crosses a worker-process boundary
+        return type(self), (self.stage, str(self))
+
+
+@contextmanager
+def pipeline_stage(stage: str, timings: dict[str, float]):
+    """
+        Time a pipeline stage and report any failure inside it as a `PipelineError`.
+
+        Parameters:
+            stage (str): Stage name, used as the `timings` key and as `PipelineError.stage`.
+            timings (dict[str, float]): Receives the wall-clock duration in seconds.
+
+        The duration is stored even when the stage raises, so failed runs still
+        show where their time went. Other exceptions (a corrupt PDF, a music21
+        error, a full disk) are re-raised as `PipelineError` chained to the original.
+        """
+    start = time.perf_counter()
+    try:
+        yield
+    except PipelineError:
+        raise
+    except Exception as exc:
+        raise PipelineError(stage, f"{type(exc).__name__}: {exc}") from exc
+    finally:
+        timings[stage] = round(time.perf_counter() - start, 3)
+        log.debug(f"Stage {stage} took {timings[stage]:.3f}s")
+
+
+def run_pipeline(input_file: Path, work_dir: Path, timings: dict[str, float] | None = None,
+                 degraded: list[str] | None = None) -> Path:
+    """
+        Run every stage for one input inside a working directory.
 
         Parameters:
             input_file (Path): Input file (PDF or image).
-            output_dir (Path): Root output directory.
+            work_dir (Path): Directory for images, MusicXML, MIDI and audio.
+            timings (dict[str, float] | None): Filled with per-stage durations.
+                For PDFs "images" overlaps "omr", which covers both.
+            degraded (list[str] | None): Receives a note for every way the result
+                falls short of a clean run (pages Audiveris skipped, the MuseScore
+                fallback), so the caller can avoid caching it.
+
+        Returns:
+            Path: Path to the audio file inside `work_dir`.
+
+        Raises:
+            PipelineError: If a stage fails or produces no output.
 
         Workflow:
-        - Converts input to image(s).
+        - Converts input to image(s); PDF pages are handed to Audiveris in batches as they are rendered.
         - Runs Audiveris to generate MusicXML.
-        - Falls back to MuseScore if Audiveris fails.
-        - Converts MusicXML → MIDI → MP3.
-        - Plays final audio output.
+        - Runs MuseScore speculatively alongside Audiveris (PDF only) and uses its
+          result if Audiveris produces no MusicXML; otherwise MuseScore is cancelled.
+        - Converts MusicXML → MIDI → audio (Opus by default, see AUDIO_FORMAT).
         """
 
     base_name = input_file.stem
-    work_dir = output_dir / base_name
     image_dir = work_dir / "images"
-    work_dir.mkdir(parents=True, exist_ok=True)
+    # Separate output trees so the speculative MuseScore run cannot clobber Audiveris files
+    audiveris_dir = work_dir / "audiveris"
+    musescore_dir = work_dir / "musescore"
+    # A kept work dir still holds the previous run's books, whose page ranges may
+    # differ from this run's; find_scores would merge both
+    for stale in (audiveris_dir, musescore_dir):
+        shutil.rmtree(stale, ignore_errors=True)
+    audiveris_dir.mkdir(parents=True, exist_ok=True)
+    images, skipped, mxl_files = [], [], []
+
+    timings = {} if timings is None else timings
+    degraded = [] if degraded is None else degraded
+
+    # Start MuseScore speculatively so a failed Audiveris run does not add its full runtime
+    cancel_musescore = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as speculative:
+        musescore_future = speculative.submit(try_musescore_fallback, input_file, musescore_dir, cancel_musescore)
+        try:
+            with pipeline_stage("omr", timings):
+                if input_file.suffix.lower() == ".pdf":
+                    images, skipped = run_audiveris_pipelined(input_file, image_dir, audiveris_dir, timings)
+                else:
+                    with pipeline_stage("images", timings):
+                        images = convert_to_images(input_file, image_dir)
+                    if images:
+                        skipped = run_audiveris(images, audiveris_dir)
+                if not images:
+                    raise PipelineError("images", "No images found or converted.")
+
+                # Prefer compressed MusicXML
+                mxl_files, xml_files = find_scores(audiveris_dir)
+                mxl_files = mxl_files or xml_files
+        except BaseException:
+            # Nothing will use MuseScore's result once this run has failed
+            cancel_musescore.set()
+            raise
+
+        # Stop MuseScore unless its result is still needed
+        if mxl_files:
+            cancel_musescore.set()
+        else:
+            log.info("Waiting for MuseScore fallback...")
+            with pipeline_stage("musescore", timings):
+                mxl_files = musescore_future.result()
+            if mxl_files:
+                degraded.append("used the MuseScore fallback")
 
-    images = convert_to_images(input_file, image_dir)
-    if not images:
-        log.error("No images found or converted.")
-        return
+    if not mxl_files:
+        raise PipelineError("omr", "No MusicXML files found.")
+    if skipped:
+        degraded.append(f"Audiveris skipped {', '.join(img.name for img in skipped)}")
 
-    run_audiveris(images, work_dir)
+    with pipeline_stage("midi", timings):
+        midi_path = convert_to_midi(base_name, mxl_files, work_dir)
 
-    mxl_files = list(work_dir.rglob("*.mxl")) or list(work_dir.rglob("*.xml"))
-    if not mxl_files:
-        log.info("Trying MuseScore fallback...")
-        mxl_files = try_musescore_fallback(input_file, work_dir)
+    with pipeline_stage("audio", timings):
+        audio_path = convert_midi_to_audio(midi_path, work_dir / f"{base_name}.{audio_format}")
+    return audio_path
 
-    if not mxl_files:
-        log.error("No MusicXML files found.")
-        return
 
-    midi_path = convert_to_midi(base_name, mxl_files, work_dir)
-    mp3_path = work_dir / f"{base_name}.mp3"
-    convert_midi_to_mp3(midi_path, mp3_path)
+def file_signature(path: Path) -> list | None:
+    """Identify a file by resolved path, size and mtime; None if it cannot be read."""
+    try:
+        path = path.resolve()
+        st = path.stat()
+    except OSError:
+        return None
+    return [str(path), st.st_size, st.st_mtime_ns]
+
+
+def input_digest(input_file: Path) -> str:
+    """
+        Hash an input file together with everything that shapes its output.
+
+        Parameters:
+            input_file (Path): Input file (PDF or image).
+
+        Returns:
+            str: A short hex digest of the file bytes, `PIPELINE_VERSION`, the
+            settings that change the generated audio, and the SoundFont and
+            Audiveris install it is rendered with.
+
+        Tools are identified by `file_signature` rather than by hashing or running
+        them, so replacing the SoundFont or upgrading Audiveris invalidates the cache.
+        """
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(input_file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    settings = [
+        PIPELINE_VERSION, transpose_interval, strategy, left_hand, right_hand, quantize, pdf_dpi, audio_format,
+        # Pages are grouped into TIFF books by batch size, and the rasterizers differ in output
+        audiveris_batch_size, pdfium is not None,
+        file_signature(soundfont_path), file_signature(audiveris_bin),
+    ]
+    digest.update(json.dumps(settings).encode())
+    return digest.hexdigest()
+
+
+def scratch_root() -> str | None:
+    """
+        Pick where the temporary working directory is created.
+
+        Returns:
+            str | None: `/dev/shm` when it exists and has at least
+            `SCRATCH_MIN_FREE_BYTES` free; otherwise None, i.e. the regular temp dir.
+        """
+    shm = Path("/dev/shm")
+    if not shm.is_dir():
+        return None
+    try:
+        if shutil.disk_usage(shm).free >= SCRATCH_MIN_FREE_BYTES:
+            return str(shm)
+    except OSError:
+        pass
+    log.debug("Not enough free space on /dev/shm, using the regular temp dir")
+    return None
+
+
+def link_output(target: Path, link: Path):
+    """
+        Point `link` at `target` (in the same directory), replacing any old link or file.
+
+        Falls back to a copy where symlinks are not available (e.g. Windows without
+        developer mode).
+        """
+    link.unlink(missing_ok=True)
+    try:
+        link.symlink_to(target.name)
+    except OSError:
+        shutil.copyfile(target, link)
+
+
+def store_output(src: Path, dest: Path, keep_source: bool = False):
+    """
+        Place `src` at `dest` so an interrupted copy never looks like a finished output.
+
+        Parameters:
+            src (Path): Finished file in the working directory.
+            dest (Path): Final path in the output directory.
+            keep_source (bool): Copy instead of move, leaving `src` in place.
+
+        The file is first written to a hidden `.part` name next to `dest` and then
+        renamed with `os.replace`, which is atomic within one filesystem. A copy cut
+        short by a full disk or Ctrl-C leaves no file under the cached name.
+        """
+    part = dest.with_name(f".{dest.name}.part")
+    try:
+        if keep_source:
+            shutil.copyfile(src, part)
+        else:
+            shutil.move(src, part)
+        os.replace(part, dest)
+    finally:
+        part.unlink(missing_ok=True)
+
+
+def process_input(input_file: Path, output_dir: Path, play: bool = False,
+                  keep_intermediates: bool = False, force: bool = False) -> Path:
+    """
+        Full pipeline for processing a single sheet music input file.
+
+        Parameters:
+            input_file (Path): Input file (PDF or image).
+            output_dir (Path): Root output directory.
+            play (bool): Play the final audio when done (blocks until playback ends).
+            keep_intermediates (bool): Work in `output_dir/<name>/` and keep the
+                images, MusicXML and MIDI there.
+            force (bool): Run the pipeline even when a cached output exists.
+
+        Returns:
+            Path: Path to the final audio file.
+
+        Raises:
+            PipelineError: If a stage fails; `stage` names which one.
+
+        By default the intermediates are written to a temporary directory on
+        `/dev/shm` (memory-backed, when available with enough free space, see
+        `scratch_root`) and only the audio and the
+        note-sequence JSON are moved to `output_dir`. Plays final audio output
+        if `play` is set.
+
+        The audio and note JSON are stored as `<name>.<digest>.<format>` and
+        `<name>.<digest>.json`, with `<name>.<format>` and `<name>.json` linked to
+        them; when the audio already exists for the same input and settings, the
+        whole pipeline is skipped unless `force` is set. The audio is stored last,
+        so its presence means both files are complete. A degraded run (pages
+        Audiveris skipped, or the MuseScore fallback) is written straight to
+        `<name>.<format>` and `<name>.json` and never cached, so the next run
+        tries again.
+
+        Per-stage durations are written to `<name>.timings.json` in `output_dir`
+        whenever the pipeline runs, including failed runs.
+        """
+
+    base_name = input_file.stem
+    output_dir.mkdir(parents=True, exist_ok=True)
+    digest = input_digest(input_file)
+    cached_path = output_dir / f"{base_name}.{digest}.{audio_format}"
+    cached_json = output_dir / f"{base_name}.{digest}.json"
+    final_link = output_dir / f"{base_name}.{audio_format}"
+    json_link = output_dir / f"{base_name}.json"
+
+    degraded = []
+    if cached_path.exists() and not force:
+        log.info(f"Using cached output: {cached_path}")
+        if keep_intermediates:
+            log.warning("Intermediates are not regenerated for a cached output; use --force to rerun")
+    else:
+        timings = {}
+        try:
+            with ExitStack() as stack:
+                if keep_intermediates:
+                    work_dir = output_dir / base_name
+                else:
+                    work_dir = Path(stack.enter_context(
+                        tempfile.TemporaryDirectory(prefix=f"tunereader-{base_name}-", dir=scratch_root())
+                    ))
+                audio_path = run_pipeline(input_file, work_dir, timings, degraded)
+                with pipeline_stage("output", timings):
+                    json_path = work_dir / f"{base_name}.json"
+                    if degraded:
+                        log.warning(f"Output is incomplete ({'; '.join(degraded)}); not caching it")
+                        # os.replace swaps out the links themselves, never the cached files behind them
+                        json_link.unlink(missing_ok=True)
+                        if json_path.exists():
+                            store_output(json_path, json_link, keep_source=keep_intermediates)
+                        store_output(audio_path, final_link, keep_source=keep_intermediates)
+                    else:
+                        if json_path.exists():
+                            store_output(json_path, cached_json, keep_source=keep_intermediates)
+                        store_output(audio_path, cached_path, keep_source=keep_intermediates)
+        finally:
+            # Never let a failed timings write mask the pipeline's own error
+            try:
+                (output_dir / f"{base_name}.timings.json").write_text(json.dumps(timings, indent=2))
+            except OSError as e:
+                log.warning(f"Could not write stage timings: {e}")
+
+    if not degraded:
+        link_output(cached_path, final_link)
+        if cached_json.exists():
+            link_output(cached_json, json_link)
+        else:
+            # Never leave the note sequence of other settings next to this audio
+            json_link.unlink(missing_ok=True)
+
+    if play:
+        play_audio(final_link)
+    return final_link
+
+
+def process_batch_item(input_file: Path, output_dir: Path, workers: int, cpus: int,
+                       keep_intermediates: bool = False, force: bool = False) -> Path:
+    """
+        Run `process_input` for one file of a batch inside a worker process.
+
+        Parameters:
+            input_file (Path): Input file (PDF or image).
+            output_dir (Path): Root output directory.
+            workers (int): Audiveris JVMs this file may run at once; replaces
+                `audiveris_workers` and `audiveris_slots` in the worker process.
+            cpus (int): CPU budget for this file's nested pools; becomes `cpu_budget`.
+            keep_intermediates (bool): Passed through to `process_input`.
+            force (bool): Passed through to `process_input`.
+
+        Returns:
+            Path: Path to the final audio file.
+
+        Raises:
+            PipelineError: If a stage fails.
+
+        The encode stage runs at `ENCODE_NICENESS` here, so it yields to the OMR and
+        parsing work of the other files in the batch.
+        """
+    global audiveris_workers, audiveris_slots, cpu_budget, encode_niceness
+    audiveris_workers = workers
+    audiveris_slots = threading.BoundedSemaphore(workers)
+    cpu_budget = cpus
+    encode_niceness = ENCODE_NICENESS
+    return process_input(input_file, output_dir, keep_intermediates=keep_intermediates, force=force)
+
+
+def collect_inputs(path: Path) -> list[Path]:
+    """
+        Resolve the command-line input to the list of files to process.
+
+        Parameters:
+            path (Path): A single PDF/image file or a directory of them.
+
+        Returns:
+            list[Path]: The input file itself, or the supported files directly
+            inside the directory in natural sort order.
+        """
+    if not path.is_dir():
+        return [path]
+    return natsorted(p for p in path.iterdir() if p.suffix.lower() in INPUT_SUFFIXES)
 
 # === Entry Point ===
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert sheet music (PDF/image) into audio.")
+    parser.add_argument("input", nargs="?", type=Path, default=input_file,
+                        help="PDF/image file or a directory of them (default: INPUT_FILE)")
+    parser.add_argument("--play", action="store_true", help="play the audio once it has been created")
+    parser.add_argument("--keep-intermediates", action="store_true",
+                        help="keep images, MusicXML and MIDI in OUTPUT_DIR/<name>/")
+    parser.add_argument("--force", action="store_true", help="rerun the pipeline even if a cached output exists")
+    args = parser.parse_args()
+
     check_dependencies()
-    if not input_file.exists():
-        log.error(f"Input file not found: {input_file}")
+    if not args.input.exists():
+        log.error(f"Input file not found: {args.input}")
+        exit(1)
+    inputs = collect_inputs(args.input)
+    if not inputs:
+        log.error(f"No input files found in: {args.input}")
+        exit(1)
+    # Outputs are named after the stem, so a.pdf and a.png would share them
+    clashes = sorted(stem for stem, count in Counter(p.stem for p in inputs).items() if count > 1)
+    if clashes:
+        log.error(f"Input files share a name and would overwrite each other's output: {', '.join(clashes)}")
         exit(1)
-    process_input(input_file, output_dir)
+
+    if len(inputs) == 1:
+        try:
+            process_input(inputs[0], output_dir, play=args.play, keep_intermediates=args.keep_intermediates,
+                          force=args.force)
+        except PipelineError as e:
+            log.error(f"Processing failed at stage '{e.stage}': {e}", exc_info=True)
+            exit(1)
+    else:
+        # Saturate the cores across files; split the JVM and CPU budgets so the batch
+        # as a whole still runs about `audiveris_workers` Audiveris processes and
+        # its nested pools do not oversubscribe the machine. The CPU budget is the
+        # largest of `pin_worker`'s slices, which differ by at most one core
+        workers = min(len(inputs), batch_workers)
+        log.info(f"Processing {len(inputs)} files with {workers} worker(s)...")
+        with worker_pool(workers) as executor:
+            futures = [
+                executor.submit(process_batch_item, path, output_dir, max(1, audiveris_workers // workers),
+                                -(-available_cores() // workers), args.keep_intermediates, args.force)
+                for path in inputs
+            ]
+            results = []
+            for path, future in zip(inputs, futures):
+                try:
+                    results.append(future.result())
+                except PipelineError as e:
+                    log.error(f"{path.name}: processing failed at stage '{e.stage}': {e}", exc_info=True)
+                except Exception as e:
+                    # e.g. an unreadable input or a worker that died; keep reporting the rest
+                    log.error(f"{path.name}: processing failed: {e}", exc_info=True)
+        # Play sequentially so audio streams never overlap
+        if args.play:
+            for audio_path in results:
+                play_audio(audio_path)
+        if len(results) < len(inputs):
+            exit(1)